@@ -1,34 +1,157 @@
+import asyncio
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import torch
 from medical_nlp_pipeline import MedicalNLPPipeline
 from sentiment_intent_analysis import PatientSentimentAnalyzer
 from soap_note_generator import SOAPNoteGenerator
+from utterance_dedup import NearDuplicateCache
 
 class PhysicianNotetakerPipeline:
-    def __init__(self):
-        """Initialize all components of the pipeline"""
-        self.medical_nlp = MedicalNLPPipeline()
-        self.sentiment_analyzer = PatientSentimentAnalyzer()
+    """End-to-end pipeline combining summary, sentiment/intent and SOAP note.
+
+    The three stages are independent, so they are run concurrently on a
+    bounded thread pool. Only the Medical_Summary stage runs torch (NER and
+    KeyBERT), which releases the GIL during inference; the sentiment/intent
+    and SOAP stages are rule-based Python and spaCy code that mostly hold
+    the GIL. The overlap therefore comes from running the Python stages
+    while the model-heavy stage is inside torch, and latency is bounded by
+    the summary stage plus whatever Python work contends with it.
+
+    Thread safety: one pipeline instance may be shared across threads and
+    coroutines. Each component (and the models and tokenizers it owns) is
+    guarded by its own lock, so a component never runs two calls at once,
+    while different components run in parallel.
+    """
+
+    STAGES = ("Medical_Summary", "Sentiment_Intent", "SOAP_Note")
+
+    def __init__(self, max_workers=None, torch_num_threads=None, deduplicate=False,
+                 ner_model_name="samrawal/bert-base-uncased_clinical-ner",
+                 sentiment_model_name="bert-base-uncased", intent_model_name="bert-base-uncased"):
+        """Initialize all components of the pipeline
+
+        max_workers bounds the stage executor (defaults to one worker per
+        stage). torch_num_threads, when given, is passed to
+        torch.set_num_threads once at construction. This is a process-wide
+        setting, not a per-stage limit: it affects every torch call in the
+        process and is overwritten by any later call, including another
+        pipeline built with a different value. Left as None, torch threading
+        is not touched.
+        When deduplicate is set, near-duplicate utterances reuse earlier NER
+        outputs across all transcripts processed by this pipeline.
+        The model names are passed to the components, e.g. to load a
+        distilled NER student exported by distillation.py.
+        """
+        # Only NER runs a model per utterance; sentiment/intent scores the
+        # joined patient dialogue with keyword rules, so it is not cached
+        self.dedup_caches = {}
+        if deduplicate:
+            self.dedup_caches = {"NER": NearDuplicateCache()}
+        self.medical_nlp = MedicalNLPPipeline(ner_model_name=ner_model_name,
+                                              dedup_cache=self.dedup_caches.get("NER"))
+        self.sentiment_analyzer = PatientSentimentAnalyzer(sentiment_model_name=sentiment_model_name,
+                                                           intent_model_name=intent_model_name)
         self.soap_generator = SOAPNoteGenerator()
+        
+        # One lock per component: HF pipelines and fast tokenizers are not
+        # safe to call from several threads at the same time
+        self._medical_lock = threading.Lock()
+        self._sentiment_lock = threading.Lock()
+        self._soap_lock = threading.Lock()
+        
+        self.max_workers = max_workers or len(self.STAGES)
+        self.torch_num_threads = torch_num_threads
+        if torch_num_threads is not None:
+            torch.set_num_threads(torch_num_threads)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="notetaker-stage"
+        )
+    
+    def _run_medical_summary(self, transcript):
+        with self._medical_lock:
+            return json.loads(self.medical_nlp.analyze_transcript(transcript))
+    
+    def _run_sentiment_intent(self, transcript):
+        with self._sentiment_lock:
+            return json.loads(self.sentiment_analyzer.analyze_patient_dialogue(transcript))
+    
+    def _run_soap_note(self, transcript):
+        with self._soap_lock:
+            return json.loads(self.soap_generator.generate_soap_note(transcript))
+    
+    def _stage_functions(self):
+        return (self._run_medical_summary, self._run_sentiment_intent, self._run_soap_note)
+    
+    def analyze(self, transcript):
+        """Run all stages concurrently and return the combined results as a dict"""
+        futures = [self._executor.submit(stage, transcript) for stage in self._stage_functions()]
+        return dict(zip(self.STAGES, [future.result() for future in futures]))
+    
+    async def analyze_async(self, transcript):
+        """Async variant of analyze; stages run concurrently on the stage executor"""
+        loop = asyncio.get_running_loop()
+        outputs = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, stage, transcript)
+            for stage in self._stage_functions()
+        ])
+        return dict(zip(self.STAGES, outputs))
     
     def process_transcript(self, transcript):
         """Process transcript through all components of the pipeline"""
-        # Medical NLP summarization
-        medical_summary = json.loads(self.medical_nlp.analyze_transcript(transcript))
-        
-        # Sentiment and intent analysis
-        sentiment_intent = json.loads(self.sentiment_analyzer.analyze_patient_dialogue(transcript))
-        
-        # SOAP note generation
-        soap_note = json.loads(self.soap_generator.generate_soap_note(transcript))
-        
-        # Combine results
-        results = {
-            "Medical_Summary": medical_summary,
-            "Sentiment_Intent": sentiment_intent,
-            "SOAP_Note": soap_note
-        }
-        
+        results = self.analyze(transcript)
+        return json.dumps(results, indent=2)
+    
+    async def process_transcript_async(self, transcript):
+        """Process transcript through all components without blocking the event loop"""
+        results = await self.analyze_async(transcript)
         return json.dumps(results, indent=2)
+    
+    async def process_transcripts_async(self, transcripts):
+        """Process several transcripts concurrently, in input order
+
+        At most max_workers transcripts are in flight at once: a fixed set of
+        worker coroutines pulls from the (possibly lazy) transcripts iterable,
+        so pending futures and inputs stay bounded. All results are returned
+        together; for large archives stream them with write_batch instead.
+        """
+        items = enumerate(transcripts)
+        results = {}
+
+        async def worker():
+            for index, transcript in items:
+                results[index] = await self.process_transcript_async(transcript)
+
+        await asyncio.gather(*[worker() for _ in range(self.max_workers)])
+        return [results[index] for index in range(len(results))]
+    
+    def write_batch(self, transcripts, writer):
+        """Process (transcript_id, transcript) pairs and stream results to a writer
+
+        writer is typically a result_writer.ColumnarResultWriter; results are
+        handed over one transcript at a time so memory stays bounded.
+        """
+        count = 0
+        for transcript_id, transcript in transcripts:
+            writer.write(transcript_id, self.analyze(transcript))
+            count += 1
+        return count
+    
+    def dedup_stats(self):
+        """Report the near-duplicate deduplication rate of each component"""
+        return {name: cache.stats() for name, cache in self.dedup_caches.items()}
+    
+    def close(self):
+        """Shut down the stage executor"""
+        self._executor.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 # Example usage
@@ -90,6 +213,10 @@ if __name__ == "__main__":
     Physician: You're very welcome, Ms. Jones. Take care, and don't hesitate to reach out if you need anything.
     """
     
-    pipeline = PhysicianNotetakerPipeline()
-    results = pipeline.process_transcript(transcript)
-    print(results)
+    with PhysicianNotetakerPipeline() as pipeline:
+        results = pipeline.process_transcript(transcript)
+        print(results)
+        
+        # Async usage: stages of each transcript run concurrently
+        async_results = asyncio.run(pipeline.process_transcript_async(transcript))
+        print(async_results)
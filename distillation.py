@@ -0,0 +1,375 @@
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import time
+import torch
+import torch.nn.functional as F
+from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
+from utterance_dedup import has_speaker_turns, split_utterances
+
+# Teacher used by MedicalNLPPipeline.ner. Only NER is distilled:
+# PatientSentimentAnalyzer decides sentiment and intent with keyword rules,
+# and its BERT classifiers are untrained placeholders that are never called,
+# so there is no meaningful teacher to distill for those tasks.
+TEACHER_MODEL_NAME = "samrawal/bert-base-uncased_clinical-ner"
+
+
+def load_corpus(corpus_dir, max_transcripts=None, seed=0):
+    """Load the .txt transcripts in a local directory
+
+    No labels are needed since the teacher provides the training targets.
+    """
+    transcripts = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "**", "*.txt"), recursive=True)):
+        with open(path, "r", encoding="utf-8") as file:
+            text = file.read().strip()
+        if text:
+            transcripts.append(text)
+
+    if not transcripts:
+        raise ValueError(f"No transcripts found in {corpus_dir}")
+
+    random.Random(seed).shuffle(transcripts)
+    if max_transcripts:
+        transcripts = transcripts[:max_transcripts]
+    return transcripts
+
+
+def ner_inputs(transcript):
+    """Texts MedicalNLPPipeline.extract_entities passes to NER for a transcript
+
+    Returns the whole transcript (the default path) and, when it has speaker
+    turns, its utterance segments (the deduplicate=True path).
+    """
+    segments = split_utterances(transcript) if has_speaker_turns(transcript) else []
+    return {"transcript": [transcript], "utterance": segments}
+
+
+def max_input_length(tokenizer, teacher):
+    """Longest input the NER pipeline feeds the model"""
+    model_max_length = tokenizer.model_max_length or teacher.config.max_position_embeddings
+    return min(model_max_length, teacher.config.max_position_embeddings)
+
+
+def encode_windows(tokenizer, text, max_length):
+    """Token ids of text split into consecutive windows of at most max_length
+
+    The first window of a transcript is exactly what the NER pipeline sees
+    after truncation; later windows add training data and keep every
+    position embedding up to max_length in use.
+    """
+    encoded = tokenizer(text, truncation=True, max_length=max_length, return_overflowing_tokens=True)
+    return list(encoded["input_ids"])
+
+
+def build_examples(tokenizer, transcripts, max_length):
+    """Token id windows of whole transcripts and of their utterance segments"""
+    examples = []
+    for transcript in transcripts:
+        inputs = ner_inputs(transcript)
+        for text in inputs["transcript"] + inputs["utterance"]:
+            examples.extend(encode_windows(tokenizer, text, max_length))
+    return examples
+
+
+def load_teacher(model_name=TEACHER_MODEL_NAME, local_files_only=False):
+    """Load the NER teacher model and tokenizer"""
+    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=local_files_only)
+    teacher = AutoModelForTokenClassification.from_pretrained(model_name, local_files_only=local_files_only)
+    teacher.eval()
+    return teacher, tokenizer
+
+
+def build_student(teacher, num_layers=4, hidden_size=256, num_heads=4, intermediate_size=None):
+    """Build a compact student with the teacher's vocabulary and label set
+
+    The student keeps the teacher's model class and config (labels, vocab,
+    position embeddings) so it can be loaded wherever the teacher is.
+    """
+    config = teacher.config.__class__.from_dict(teacher.config.to_dict())
+    config.num_hidden_layers = num_layers
+    config.hidden_size = hidden_size
+    config.num_attention_heads = num_heads
+    config.intermediate_size = intermediate_size or hidden_size * 4
+    return teacher.__class__(config)
+
+
+def batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def collate(tokenizer, examples):
+    """Pad a batch of token id lists into model inputs"""
+    return tokenizer.pad({"input_ids": examples}, return_tensors="pt")
+
+
+def distillation_loss(student_logits, teacher_logits, attention_mask, temperature):
+    """KL divergence between softened teacher and student distributions
+
+    Per-token losses are masked so padding does not contribute.
+    """
+    student_log_probs = F.log_softmax(student_logits / temperature, dim=-1)
+    teacher_probs = F.softmax(teacher_logits / temperature, dim=-1)
+    loss = F.kl_div(student_log_probs, teacher_probs, reduction="none").sum(-1)
+    mask = attention_mask.to(loss.dtype)
+    loss = (loss * mask).sum() / mask.sum()
+    return loss * temperature ** 2
+
+
+def distill(teacher, student, tokenizer, examples, epochs=3, batch_size=8, learning_rate=5e-4,
+            temperature=2.0, seed=0, log_every=50):
+    """Train the student to match the teacher's outputs on token id windows"""
+    torch.manual_seed(seed)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=learning_rate)
+    teacher.eval()
+    student.train()
+    history = []
+    step = 0
+
+    for epoch in range(epochs):
+        order = list(examples)
+        random.Random(seed + epoch).shuffle(order)
+        for batch in batches(order, batch_size):
+            inputs = collate(tokenizer, batch)
+            with torch.no_grad():
+                teacher_logits = teacher(**inputs).logits
+            student_logits = student(**inputs).logits
+
+            loss = distillation_loss(student_logits, teacher_logits, inputs["attention_mask"], temperature)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+            history.append(loss.item())
+            step += 1
+            if log_every and step % log_every == 0:
+                print(f"epoch {epoch + 1} step {step}: loss {loss.item():.4f}")
+
+    student.eval()
+    return history
+
+
+def f1_scores(matched, predicted, expected):
+    precision = matched / predicted if predicted else 0.0
+    recall = matched / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def token_metrics(teacher, student, tokenizer, examples, batch_size=8):
+    """Token-level agreement, excluding padding and special tokens
+
+    token_agreement counts every remaining token, most of which are "O",
+    so it is only a secondary number. The precision/recall/F1 are computed
+    on tokens where the teacher or the student predicts a non-O label.
+    """
+    # Without an "O" label every token counts as an entity token
+    outside_id = teacher.config.label2id.get("O", -1)
+    special_ids = torch.tensor(tokenizer.all_special_ids)
+    agree, total, matched, predicted, expected = 0, 0, 0, 0, 0
+    with torch.no_grad():
+        for batch in batches(examples, batch_size):
+            inputs = collate(tokenizer, batch)
+            mask = inputs["attention_mask"].bool() & ~torch.isin(inputs["input_ids"], special_ids)
+            teacher_labels = teacher(**inputs).logits.argmax(-1)[mask]
+            student_labels = student(**inputs).logits.argmax(-1)[mask]
+            agree += (teacher_labels == student_labels).sum().item()
+            total += teacher_labels.numel()
+            teacher_entity = teacher_labels != outside_id
+            student_entity = student_labels != outside_id
+            matched += (teacher_entity & (teacher_labels == student_labels)).sum().item()
+            predicted += student_entity.sum().item()
+            expected += teacher_entity.sum().item()
+
+    metrics = {"token_agreement": agree / total if total else 0.0}
+    metrics.update({f"entity_token_{name}": value
+                    for name, value in f1_scores(matched, predicted, expected).items()})
+    return metrics
+
+
+def entity_metrics(teacher, student, tokenizer, texts):
+    """Entity-level precision/recall/F1 of the student against the teacher
+
+    Both models run through pipeline("ner", aggregation_strategy="simple"),
+    exactly as MedicalNLPPipeline.ner does, and entities match when their
+    group and character span agree.
+    """
+    if not texts:
+        return {"precision": 0.0, "recall": 0.0, "f1": 0.0, "teacher_entities": 0, "inputs": 0}
+    teacher_ner = pipeline("ner", model=teacher, tokenizer=tokenizer, aggregation_strategy="simple")
+    student_ner = pipeline("ner", model=student, tokenizer=tokenizer, aggregation_strategy="simple")
+    matched, predicted, expected = 0, 0, 0
+    for text in texts:
+        teacher_entities = {(e["entity_group"], e["start"], e["end"]) for e in teacher_ner(text)}
+        student_entities = {(e["entity_group"], e["start"], e["end"]) for e in student_ner(text)}
+        matched += len(teacher_entities & student_entities)
+        predicted += len(student_entities)
+        expected += len(teacher_entities)
+    scores = f1_scores(matched, predicted, expected)
+    scores["teacher_entities"] = expected
+    scores["inputs"] = len(texts)
+    return scores
+
+
+def time_model(model, tokenizer, examples, batch_size):
+    """Seconds taken by model to run inference over token id windows
+
+    Inputs are padded up front so only the forward passes are timed.
+    """
+    encoded = [collate(tokenizer, batch) for batch in batches(examples, batch_size)]
+    with torch.no_grad():
+        # Untimed warm-up so first-call overhead does not count against the model
+        model(**encoded[0])
+        start = time.perf_counter()
+        for inputs in encoded:
+            model(**inputs)
+    return time.perf_counter() - start
+
+
+def measure_speedup(teacher, student, tokenizer, examples, batch_size=8, repeats=3):
+    """Median teacher and student inference time over several repeats
+
+    The order of the two models alternates between repeats so neither one
+    consistently benefits from a warmer cache.
+    """
+    teacher_times, student_times = [], []
+    for repeat in range(repeats):
+        order = [(teacher, teacher_times), (student, student_times)]
+        if repeat % 2:
+            order.reverse()
+        for model, times in order:
+            times.append(time_model(model, tokenizer, examples, batch_size))
+    teacher_seconds = statistics.median(teacher_times)
+    student_seconds = statistics.median(student_times)
+    return {
+        "teacher_seconds": teacher_seconds,
+        "student_seconds": student_seconds,
+        "speedup": teacher_seconds / student_seconds if student_seconds else 0.0,
+        "timing_repeats": repeats,
+        "timing_windows": len(examples)
+    }
+
+
+def evaluate(teacher, student, tokenizer, transcripts, max_length, timing_transcripts=None,
+             batch_size=8, timing_repeats=3):
+    """Report agreement with the teacher and the inference speedup
+
+    The headline numbers are entity-level F1 through the NER pipeline on
+    held-out whole transcripts (the default analyze_transcript path) and on
+    their utterance segments (the deduplicate=True path). Token metrics on
+    the same windows used for training are reported alongside. Timing does
+    not need held-out data, so it runs over timing_transcripts (defaults to
+    transcripts) to get a larger, steadier sample.
+    """
+    teacher.eval()
+    student.eval()
+    inputs = {"transcript": [], "utterance": []}
+    for transcript in transcripts:
+        for form, texts in ner_inputs(transcript).items():
+            inputs[form].extend(texts)
+
+    report = {
+        "transcript_entities": entity_metrics(teacher, student, tokenizer, inputs["transcript"]),
+        "utterance_entities": entity_metrics(teacher, student, tokenizer, inputs["utterance"])
+    }
+    report.update(token_metrics(teacher, student, tokenizer,
+                                build_examples(tokenizer, transcripts, max_length),
+                                batch_size=batch_size))
+    timing_examples = build_examples(tokenizer, timing_transcripts or transcripts, max_length)
+    report.update(measure_speedup(teacher, student, tokenizer, timing_examples,
+                                  batch_size=batch_size, repeats=timing_repeats))
+    report["teacher_parameters"] = sum(p.numel() for p in teacher.parameters())
+    report["student_parameters"] = sum(p.numel() for p in student.parameters())
+    return report
+
+
+def export_student(student, tokenizer, output_dir):
+    """Save the student so MedicalNLPPipeline can load it by path"""
+    os.makedirs(output_dir, exist_ok=True)
+    student.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return output_dir
+
+
+def run(args):
+    """Distill, evaluate and export the NER student"""
+    transcripts = load_corpus(args.corpus, max_transcripts=args.max_transcripts, seed=args.seed)
+    teacher, tokenizer = load_teacher(args.teacher, local_files_only=args.local_files_only)
+    max_length = args.max_length or max_input_length(tokenizer, teacher)
+
+    torch.manual_seed(args.seed)
+    student = build_student(teacher, num_layers=args.layers, hidden_size=args.hidden_size,
+                            num_heads=args.heads, intermediate_size=args.intermediate_size)
+
+    # Split by transcript so no held-out utterance appears in training
+    split = max(1, int(len(transcripts) * args.eval_fraction))
+    eval_transcripts, train_transcripts = transcripts[:split], transcripts[split:] or transcripts
+    examples = build_examples(tokenizer, train_transcripts, max_length)
+    print(f"Distilling NER student on {len(train_transcripts)} transcripts "
+          f"({len(examples)} windows of up to {max_length} tokens)")
+
+    history = distill(teacher, student, tokenizer, examples, epochs=args.epochs,
+                      batch_size=args.batch_size, learning_rate=args.learning_rate,
+                      temperature=args.temperature, seed=args.seed)
+    timing_transcripts = transcripts[:args.timing_transcripts] if args.timing_transcripts else transcripts
+    report = evaluate(teacher, student, tokenizer, eval_transcripts, max_length,
+                      timing_transcripts=timing_transcripts, batch_size=args.batch_size,
+                      timing_repeats=args.timing_repeats)
+    report["final_loss"] = history[-1] if history else None
+    report["max_length"] = max_length
+    report["train_transcripts"] = len(train_transcripts)
+    report["train_windows"] = len(examples)
+    report["eval_transcripts"] = len(eval_transcripts)
+    report["output_dir"] = export_student(student, tokenizer, os.path.join(args.output, "ner"))
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distill a compact clinical NER student")
+    parser.add_argument("--corpus", required=True, help="Directory of unlabeled .txt transcripts")
+    parser.add_argument("--output", required=True, help="Directory to export the student and report to")
+    parser.add_argument("--teacher", default=TEACHER_MODEL_NAME, help="NER teacher (name or local path)")
+    parser.add_argument("--local-files-only", action="store_true", help="Do not download the teacher")
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--heads", type=int, default=4)
+    parser.add_argument("--intermediate-size", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--learning-rate", type=float, default=5e-4)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--max-length", type=int, default=None,
+                        help="Window length in tokens (defaults to the NER pipeline's limit)")
+    parser.add_argument("--max-transcripts", type=int, default=None)
+    parser.add_argument("--eval-fraction", type=float, default=0.1)
+    parser.add_argument("--timing-transcripts", type=int, default=50,
+                        help="Transcripts used to time teacher and student (0 for all)")
+    parser.add_argument("--timing-repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None, help="Torch CPU threads")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "distillation_report.json"), "w") as file:
+        json.dump(report, file, indent=2)
+    return report
+
+
+# Example usage:
+#   python distillation.py --corpus transcripts/ --output students/ \
+#       --layers 2 --hidden-size 128 --epochs 1 --max-transcripts 20
+if __name__ == "__main__":
+    main()
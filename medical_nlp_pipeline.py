@@ -3,14 +3,20 @@ import json
 from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
 from keybert import KeyBERT
 import re
+from utterance_dedup import has_speaker_turns, split_utterances
 
 class MedicalNLPPipeline:
-    def __init__(self):
-        # Load NER model - using clinical NER model
-        self.tokenizer = AutoTokenizer.from_pretrained("samrawal/bert-base-uncased_clinical-ner")
-        self.model = AutoModelForTokenClassification.from_pretrained("samrawal/bert-base-uncased_clinical-ner")
+    def __init__(self, ner_model_name="samrawal/bert-base-uncased_clinical-ner", dedup_cache=None):
+        # Load NER model - using clinical NER model by default; a distilled
+        # student exported by distillation.py can be passed as a local path
+        self.tokenizer = AutoTokenizer.from_pretrained(ner_model_name)
+        self.model = AutoModelForTokenClassification.from_pretrained(ner_model_name)
         self.ner = pipeline("ner", model=self.model, tokenizer=self.tokenizer, aggregation_strategy="simple")
         
+        # Optional NearDuplicateCache: when set, NER runs per utterance and
+        # repeated utterances reuse earlier model outputs
+        self.dedup_cache = dedup_cache
+        
         # Load spaCy model for general text processing
         self.nlp = spacy.load("en_core_web_md")
         
@@ -34,6 +40,30 @@ class MedicalNLPPipeline:
                 return f"{matches[0]}"
         return "Unknown"
     
+    def extract_utterances(self, text):
+        """Split transcript into NER segments, one per speaker utterance"""
+        return split_utterances(text)
+    
+    def extract_entities(self, text):
+        """Run NER over the transcript, reusing outputs of repeated utterances
+        
+        A cached result is only reused when the utterance matches exactly after
+        normalization and every cached entity word occurs in the new
+        utterance; otherwise NER is run again.
+        """
+        if self.dedup_cache is None or not has_speaker_turns(text):
+            # Unlabelled text goes through NER whole, as without dedup
+            return self.ner(text)
+        
+        entities = []
+        for utterance in self.extract_utterances(text):
+            lowered = utterance.lower()
+            entities.extend(self.dedup_cache.get_or_compute(
+                utterance, self.ner,
+                accept=lambda cached: all(entity["word"].lower() in lowered for entity in cached)
+            ))
+        return entities
+    
     def categorize_entities(self, entities):
         """Categorize extracted entities into medical categories"""
         categorized = {
@@ -85,7 +115,7 @@ class MedicalNLPPipeline:
         patient_name = self.extract_patient_name(transcript)
         
         # Extract entities using NER
-        entities = self.ner(transcript)
+        entities = self.extract_entities(transcript)
         
         # Categorize entities
         categorized = self.categorize_entities(entities)
@@ -0,0 +1,242 @@
+import json
+import os
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+
+SOAP_FIELDS = [
+    ("Subjective", "Chief_Complaint"),
+    ("Subjective", "History_of_Present_Illness"),
+    ("Objective", "Physical_Exam"),
+    ("Objective", "Observations"),
+    ("Assessment", "Diagnosis"),
+    ("Assessment", "Severity"),
+    ("Plan", "Treatment"),
+    ("Plan", "Follow-Up")
+]
+
+ENTITY_CATEGORIES = ["Symptoms", "Diagnosis", "Treatment", "Prognosis"]
+
+
+def soap_column(section, field):
+    """Column name of a SOAP note field, e.g. plan_follow_up"""
+    return f"{section}_{field}".lower().replace("-", "_")
+
+
+def build_schemas():
+    """Fixed schemas of the tables written by ColumnarResultWriter"""
+    return {
+        "summaries": pa.schema([
+            ("transcript_id", pa.string()),
+            ("patient_name", pa.string()),
+            ("current_status", pa.string())
+        ]),
+        "entities": pa.schema([
+            ("transcript_id", pa.string()),
+            ("category", pa.string()),
+            ("entity", pa.string())
+        ]),
+        "keywords": pa.schema([
+            ("transcript_id", pa.string()),
+            ("rank", pa.int32()),
+            ("keyword", pa.string())
+        ]),
+        "sentiment_intent": pa.schema([
+            ("transcript_id", pa.string()),
+            ("sentiment", pa.string()),
+            ("intent", pa.string())
+        ]),
+        "soap": pa.schema(
+            [("transcript_id", pa.string())]
+            + [(soap_column(section, field), pa.string()) for section, field in SOAP_FIELDS]
+        )
+    }
+
+
+class ColumnarResultWriter:
+    """Streaming sink that writes pipeline results as columnar record batches
+
+    Results are split into fixed-schema tables (summaries, entities, keywords,
+    sentiment/intent and SOAP fields), one file per table in output_dir. Files
+    are Parquet by default, or Arrow IPC with format="arrow"; readers can load
+    only the columns they need, e.g. pq.read_table(path, columns=["sentiment"]).
+
+    Two limits keep memory bounded regardless of corpus size:
+
+    - chunk_size: rows buffered per table as Python values before they are
+      converted to a compact Arrow record batch.
+    - row_group_size: Parquet rows per row group. Record batches are held
+      until a full row group is ready, so files get a few large row groups
+      instead of one per chunk, which keeps compression and column pruning
+      effective. Arrow IPC files have no row groups; each chunk is written
+      as soon as it is converted.
+
+    compression is checked up front. Parquet accepts "snappy", "gzip",
+    "brotli", "lz4", "zstd" or None; Arrow IPC only "zstd", "lz4" or None.
+    """
+
+    FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+    PARQUET_COMPRESSIONS = ("snappy", "gzip", "brotli", "lz4", "zstd", None)
+    IPC_COMPRESSIONS = ("zstd", "lz4", None)
+
+    def __init__(self, output_dir, format="parquet", chunk_size=1024, row_group_size=131072,
+                 compression="zstd"):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported format '{format}', expected one of {list(self.FORMATS)}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if row_group_size < 1:
+            raise ValueError("row_group_size must be at least 1")
+        if isinstance(compression, str):
+            compression = compression.lower()
+        if compression == "none":
+            compression = None
+        supported = self.PARQUET_COMPRESSIONS if format == "parquet" else self.IPC_COMPRESSIONS
+        if compression not in supported:
+            raise ValueError(f"Unsupported {format} compression '{compression}', "
+                             f"expected one of {list(supported)}")
+        if compression is not None and not pa.Codec.is_available(compression):
+            raise ValueError(f"Compression '{compression}' is not available in this pyarrow build")
+
+        self.output_dir = output_dir
+        self.format = format
+        self.chunk_size = chunk_size
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.schemas = build_schemas()
+        self.rows_written = {name: 0 for name in self.schemas}
+
+        os.makedirs(output_dir, exist_ok=True)
+        self._buffers = {name: self._empty_buffer(name) for name in self.schemas}
+        # Converted record batches waiting for a full Parquet row group
+        self._pending = {name: [] for name in self.schemas}
+        self._pending_rows = {name: 0 for name in self.schemas}
+        self._writers = {}
+        self._closed = False
+
+    def _empty_buffer(self, name):
+        return {column: [] for column in self.schemas[name].names}
+
+    def path(self, name):
+        """Output file of a table"""
+        return os.path.join(self.output_dir, name + self.FORMATS[self.format])
+
+    def _open_writer(self, name):
+        schema = self.schemas[name]
+        if self.format == "parquet":
+            return pq.ParquetWriter(self.path(name), schema, compression=self.compression)
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(self.path(name), schema, options=options)
+
+    def _append(self, name, row):
+        buffer = self._buffers[name]
+        for column in buffer:
+            buffer[column].append(row.get(column))
+        if len(buffer["transcript_id"]) >= self.chunk_size:
+            self._flush_table(name)
+
+    def _writer(self, name):
+        if name not in self._writers:
+            self._writers[name] = self._open_writer(name)
+        return self._writers[name]
+
+    def _flush_table(self, name, final=False):
+        """Convert buffered rows to a record batch and write what is ready
+
+        Parquet batches are only written once a full row group has
+        accumulated, or when final is set.
+        """
+        buffer = self._buffers[name]
+        num_rows = len(buffer["transcript_id"])
+        if num_rows:
+            batch = pa.RecordBatch.from_pydict(buffer, schema=self.schemas[name])
+            self._buffers[name] = self._empty_buffer(name)
+            if self.format == "arrow":
+                self._writer(name).write_batch(batch)
+                self.rows_written[name] += num_rows
+                return
+            self._pending[name].append(batch)
+            self._pending_rows[name] += num_rows
+
+        pending_rows = self._pending_rows[name]
+        if pending_rows and (final or pending_rows >= self.row_group_size):
+            table = pa.Table.from_batches(self._pending[name], schema=self.schemas[name])
+            self._writer(name).write_table(table, row_group_size=self.row_group_size)
+            self.rows_written[name] += pending_rows
+            self._pending[name] = []
+            self._pending_rows[name] = 0
+
+    def write(self, transcript_id, results):
+        """Add the results of one transcript
+
+        results is the dict from PhysicianNotetakerPipeline.analyze or the
+        JSON string from process_transcript.
+        """
+        if self._closed:
+            raise ValueError("Cannot write to a closed ColumnarResultWriter")
+        if isinstance(results, str):
+            results = json.loads(results)
+        transcript_id = str(transcript_id)
+
+        summary = results.get("Medical_Summary", {})
+        self._append("summaries", {
+            "transcript_id": transcript_id,
+            "patient_name": summary.get("Patient_Name"),
+            "current_status": summary.get("Current_Status")
+        })
+        for category in ENTITY_CATEGORIES:
+            for entity in summary.get(category, []):
+                self._append("entities", {
+                    "transcript_id": transcript_id,
+                    "category": category,
+                    "entity": entity
+                })
+        for rank, keyword in enumerate(summary.get("Keywords", []), start=1):
+            self._append("keywords", {
+                "transcript_id": transcript_id,
+                "rank": rank,
+                "keyword": keyword
+            })
+
+        sentiment_intent = results.get("Sentiment_Intent", {})
+        self._append("sentiment_intent", {
+            "transcript_id": transcript_id,
+            "sentiment": sentiment_intent.get("Sentiment"),
+            "intent": sentiment_intent.get("Intent")
+        })
+
+        soap_note = results.get("SOAP_Note", {})
+        soap_row = {"transcript_id": transcript_id}
+        for section, field in SOAP_FIELDS:
+            soap_row[soap_column(section, field)] = soap_note.get(section, {}).get(field)
+        self._append("soap", soap_row)
+
+    def flush(self):
+        """Write all buffered rows
+
+        For Parquet this ends the current row group early, so call it
+        sparingly.
+        """
+        for name in self.schemas:
+            self._flush_table(name, final=True)
+
+    def close(self):
+        """Flush buffered rows and close all output files
+
+        Tables that never received a row are still written, empty, so every
+        run produces the same set of files.
+        """
+        if self._closed:
+            return
+        self.flush()
+        for name in self.schemas:
+            self._writer(name).close()
+        self._writers = {}
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -5,20 +5,22 @@ import json
 import re
 
 class PatientSentimentAnalyzer:
-    def __init__(self):
-        # Load pre-trained model and tokenizer
-        self.tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+    def __init__(self, sentiment_model_name='bert-base-uncased', intent_model_name='bert-base-uncased'):
+        # Load pre-trained models and tokenizer; the names allow loading
+        # fine-tuned classifiers. The tokenizer comes from sentiment_model_name
+        # and is shared by both classifiers, so they must use the same vocabulary
+        self.tokenizer = BertTokenizer.from_pretrained(sentiment_model_name)
         
         # In a real implementation, we would fine-tune BERT for medical sentiment
         # This is a placeholder for the fine-tuned model
         self.sentiment_model = BertForSequenceClassification.from_pretrained(
-            'bert-base-uncased', 
+            sentiment_model_name, 
             num_labels=3  # Anxious, Neutral, Reassured
         )
         
         # Intent detection model
         self.intent_model = BertForSequenceClassification.from_pretrained(
-            'bert-base-uncased',
+            intent_model_name,
             num_labels=4  # Different intent categories
         )
         
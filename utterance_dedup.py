@@ -0,0 +1,220 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+SPEAKER_PREFIXES = ('Physician:', 'Patient:')
+
+
+def has_speaker_turns(text):
+    """Whether the transcript contains Physician:/Patient: lines"""
+    return any(line.strip().startswith(SPEAKER_PREFIXES) for line in text.split('\n'))
+
+
+def split_utterances(text):
+    """Split a transcript into per-utterance segments
+
+    No text is dropped: bracketed notes such as "[Physical Examination
+    Conducted]" become their own segment, and other lines without a speaker
+    label are treated as continuations of the previous utterance.
+    """
+    utterances = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        prefix = next((prefix for prefix in SPEAKER_PREFIXES if line.startswith(prefix)), None)
+        if prefix:
+            utterances.append(line[len(prefix):].strip())
+        elif line.startswith('[') or not utterances:
+            utterances.append(line)
+        else:
+            utterances[-1] = f"{utterances[-1]} {line}".strip()
+    return [utterance for utterance in utterances if utterance]
+
+
+class NearDuplicateCache:
+    """Cache of model outputs with near-duplicate utterance detection
+
+    Stored outputs are only reused for utterances that match exactly after
+    normalization (case, punctuation and whitespace), optionally subject to
+    an accept check by the caller. Near-duplicates are detected but never
+    reused: one changed word ("left" vs "right", "pain" vs "no pain") can
+    change the model output, so they are only counted in the stats.
+
+    For detection, utterances are split into character shingles and
+    summarized with a MinHash signature. Signatures are bucketed with LSH
+    banding so that a lookup only compares against a handful of candidates,
+    and a candidate is a near-duplicate when its estimated Jaccard
+    similarity reaches the threshold.
+
+    At most max_entries utterances are kept; beyond that the oldest entries
+    are evicted first. Utterances that normalize to an empty string (e.g.
+    only punctuation) bypass the cache.
+    """
+
+    _MERSENNE_PRIME = (1 << 61) - 1
+    _MAX_HASH = (1 << 32) - 1
+
+    def __init__(self, threshold=0.9, num_perm=64, bands=16, shingle_size=4, max_entries=100000):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+
+        # Fixed hash permutations so signatures are reproducible across runs
+        self._permutations = []
+        for i in range(num_perm):
+            digest = hashlib.sha1(f"minhash-{i}".encode("utf-8")).digest()
+            a = int.from_bytes(digest[:8], "little") % self._MERSENNE_PRIME or 1
+            b = int.from_bytes(digest[8:16], "little") % self._MERSENNE_PRIME
+            self._permutations.append((a, b))
+
+        self._exact = {}
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.near_duplicates = 0
+
+    def normalize(self, text):
+        """Lowercase and collapse punctuation and whitespace"""
+        text = re.sub(r"[^\w\s]", " ", text.lower())
+        return re.sub(r"\s+", " ", text).strip()
+
+    def shingles(self, text):
+        """Character shingles of a normalized utterance"""
+        if len(text) <= self.shingle_size:
+            return {text}
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+
+    def signature(self, shingles):
+        """MinHash signature of a set of shingles"""
+        hashes = [int.from_bytes(hashlib.md5(s.encode("utf-8")).digest()[:4], "little") for s in shingles]
+        signature = []
+        for a, b in self._permutations:
+            signature.append(min(((a * h + b) % self._MERSENNE_PRIME) & self._MAX_HASH for h in hashes))
+        return tuple(signature)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)]
+
+    def _similarity(self, sig_a, sig_b):
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / self.num_perm
+
+    def fingerprint(self, text):
+        """Normalized text and MinHash signature, or (None, None) for empty text"""
+        normalized = self.normalize(text)
+        if not normalized:
+            return None, None
+        return normalized, self.signature(self.shingles(normalized))
+
+    def _is_near_duplicate(self, signature):
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        return any(self._similarity(signature, self._entries[entry_id][1]) >= self.threshold
+                   for entry_id in candidates)
+
+    def _lookup(self, normalized, signature, accept=None):
+        """Return the stored output of an exact normalized match, or None
+
+        Misses that are near-duplicates of a stored utterance are counted.
+        """
+        with self._lock:
+            self.lookups += 1
+            if normalized in self._exact:
+                value = self._entries[self._exact[normalized]][2]
+                if accept is None or accept(value):
+                    self.hits += 1
+                    return value
+                self.near_duplicates += 1
+                return None
+            if self._is_near_duplicate(signature):
+                self.near_duplicates += 1
+        return None
+
+    def _store(self, normalized, signature, value):
+        with self._lock:
+            if normalized in self._exact or self.max_entries <= 0:
+                return
+            while len(self._entries) >= self.max_entries:
+                self._evict_oldest()
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (normalized, signature, value)
+            self._exact[normalized] = entry_id
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(entry_id)
+
+    def _evict_oldest(self):
+        entry_id, (normalized, signature, _) = self._entries.popitem(last=False)
+        del self._exact[normalized]
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band][key]
+            bucket.remove(entry_id)
+            if not bucket:
+                del self._buckets[band][key]
+
+    def get(self, text):
+        """Return the cached output of an exactly matching utterance, or None"""
+        normalized, signature = self.fingerprint(text)
+        if normalized is None:
+            return None
+        return self._lookup(normalized, signature)
+
+    def put(self, text, value):
+        """Store the model output for an utterance"""
+        normalized, signature = self.fingerprint(text)
+        if normalized is None:
+            return
+        self._store(normalized, signature, value)
+
+    def get_or_compute(self, text, compute, accept=None):
+        """Return the cached output for text, running compute(text) on a miss
+
+        accept, if given, is called with a cached output and must return True
+        for it to be reused. The fingerprint is computed once, outside the
+        lock, and shared by the lookup and the store.
+        """
+        normalized, signature = self.fingerprint(text)
+        if normalized is None:
+            return compute(text)
+        value = self._lookup(normalized, signature, accept)
+        if value is None:
+            value = compute(text)
+            self._store(normalized, signature, value)
+        return value
+
+    def stats(self):
+        """Report lookups, reused hits and near-duplicate counts
+
+        dedup_rate is the fraction of lookups served from the cache;
+        near_duplicate_rate also counts near-duplicates that were recomputed.
+        """
+        with self._lock:
+            lookups = self.lookups
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "near_duplicates": self.near_duplicates,
+                "unique_utterances": len(self._entries),
+                "dedup_rate": self.hits / lookups if lookups else 0.0,
+                "near_duplicate_rate": (self.hits + self.near_duplicates) / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """Drop all cached utterances and reset the counters"""
+        with self._lock:
+            self._exact.clear()
+            self._entries = OrderedDict()
+            self._buckets = [{} for _ in range(self.bands)]
+            self.lookups = 0
+            self.hits = 0
+            self.near_duplicates = 0